@@ -1,8 +1,110 @@
+import csv
+import os
 import pandas as pd
 import numpy as np
 import requests
-import math
+import json
 import pickle # To save/load the trained model
+import warnings
+import streamlit as st
+from fractions import Fraction
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson is 3-5x faster than stdlib json on the ~tens-of-KB Open-Meteo
+# payloads; fall back to stdlib when it is not installed
+_json_loads = orjson.loads if orjson is not None else json.loads
+_json_dumps = orjson.dumps if orjson is not None else json.dumps
+
+# Cache Open-Meteo responses for 30 days; the data is static 2023 history
+WEATHER_CACHE_TTL_SECONDS = 86400 * 30
+
+class WeatherDataError(Exception):
+    """Raised when annual weather for a pincode cannot be retrieved."""
+
+# Shared session so repeat calls reuse pooled connections instead of
+# paying a fresh TCP + TLS handshake each time
+_session = requests.Session()
+_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=10))
+
+def _get_redis_client():
+    """Returns a Redis client, or None if redis is unavailable or unreachable."""
+    if redis is None:
+        return None
+    try:
+        client = redis.Redis()
+        client.ping()
+        return client
+    except redis.exceptions.RedisError:
+        return None
+
+_redis_client = _get_redis_client()
+
+# Redis hash names for the shared lookup tables
+PINCODE_LATLON_HASH = 'pincode_latlon'
+CROP_PROFIT_HASH = 'crop_profit'
+
+class RedisHashMap:
+    """
+    Read-only dict-like view over a Redis hash of "a,b" float pairs.
+
+    Supports the get()/in operations the estimation code uses, so it can
+    stand in for the in-process lookup dicts. On a horizontally scaled
+    deployment this keeps one shared copy of each table in Redis instead
+    of a full copy per worker process.
+    """
+
+    def __init__(self, client, name):
+        self._client = client
+        self._name = name
+
+    def get(self, key, default=(None, None)):
+        value = self._client.hget(self._name, str(key))
+        if value is None:
+            return default
+        first, second = value.decode().split(',')
+        return (float(first), float(second))
+
+    def __contains__(self, key):
+        return self._client.hexists(self._name, str(key))
+
+def publish_lookups_to_redis(pincode_to_latlon, crop_profit_map):
+    """
+    Publishes the lookup tables to Redis hashes and returns shared views.
+
+    Args:
+        pincode_to_latlon: Dict mapping pincode (int) to (latitude, longitude).
+        crop_profit_map: Dict mapping lowercased crop name to (profit, cost) per hectare.
+
+    Returns:
+        A (pincode_map, crop_map) tuple of RedisHashMap views backed by
+        the published hashes, or None if Redis is unavailable.
+    """
+    if _redis_client is None:
+        return None
+    try:
+        _redis_client.hset(PINCODE_LATLON_HASH,
+                           mapping={str(p): f"{lat},{lon}" for p, (lat, lon) in pincode_to_latlon.items()})
+        _redis_client.hset(CROP_PROFIT_HASH,
+                           mapping={crop: f"{profit},{cost}" for crop, (profit, cost) in crop_profit_map.items()})
+    except redis.exceptions.RedisError:
+        return None
+    return (RedisHashMap(_redis_client, PINCODE_LATLON_HASH),
+            RedisHashMap(_redis_client, CROP_PROFIT_HASH))
 
 # Assuming df_pincodes_selected, model, and df_crop_profit are loaded and available
 # You might need to save these objects and load them in your Streamlit app
@@ -13,25 +115,80 @@ import pickle # To save/load the trained model
 # df_crop_profit = pd.read_csv('crop_cost_profit_dataset.csv')
 
 
-def get_lat_lon_from_pincode(pincode, df):
+class OnnxCropModel:
     """
-    Retrieves latitude and longitude for a given pincode from a DataFrame.
+    Wraps an ONNX-compiled RandomForest behind the sklearn predict API.
+
+    The exported graph (see export_onnx.py) runs the whole forest as one
+    compiled function, so single-row predict_proba is sub-millisecond
+    versus tens of milliseconds through scikit-learn. Exposes just the
+    predict_proba/classes_ surface that the estimation code uses.
+    """
+
+    def __init__(self, onnx_path, classes_path):
+        self._session = onnxruntime.InferenceSession(onnx_path)
+        self._input_name = self._session.get_inputs()[0].name
+        self.classes_ = np.load(classes_path, allow_pickle=True)
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        # Outputs are [label, probabilities] with zipmap disabled
+        return self._session.run(None, {self._input_name: X})[1]
+
+def build_pincode_latlon_lookup(df):
+    """
+    Builds a pincode -> (latitude, longitude) dict from the pincode DataFrame.
+
+    The raw CSV columns contain degree-notation and "nan" entries that
+    force them to object dtype, so the coordinates are coerced to floats
+    and rows without a valid pair are dropped; their pincodes then fail
+    the membership check instead of reaching the weather fetch.
 
     Args:
-        pincode: The pincode to look up.
         df: The DataFrame containing pincode, latitude, and longitude information.
 
+    Returns:
+        A dict mapping each pincode (int) to a (latitude, longitude) float tuple.
+    """
+    latitude = pd.to_numeric(df['latitude'], errors='coerce')
+    longitude = pd.to_numeric(df['longitude'], errors='coerce')
+    valid = latitude.notna() & longitude.notna()
+    return dict(zip(df.loc[valid, 'pincode'].astype(int),
+                    zip(latitude[valid].values, longitude[valid].values)))
+
+def build_crop_profit_map(csv_path):
+    """
+    Builds a lowercase crop name -> (profit, cost) dict from the crop profit CSV.
+
+    The table is a ~20 row lookup, so it is parsed with the stdlib csv
+    module instead of paying for a DataFrame that would only be scanned
+    once and discarded.
+
+    Args:
+        csv_path: Path to the crop profit CSV file.
+
+    Returns:
+        A dict mapping each lowercased crop name to a
+        (profit_per_hectare, cost_per_hectare) tuple.
+    """
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        return {row['Crop'].lower(): (float(row['Profit_per_Hectare (₹)']),
+                                      float(row['Cost_of_Production_per_Hectare (₹)']))
+                for row in csv.DictReader(f)}
+
+def get_lat_lon_from_pincode(pincode, lookup):
+    """
+    Retrieves latitude and longitude for a given pincode from a precomputed lookup.
+
+    Args:
+        pincode: The pincode to look up.
+        lookup: A dict mapping pincode (int) to (latitude, longitude).
+
     Returns:
         A tuple containing (latitude, longitude) if the pincode is found,
         otherwise (None, None).
     """
-    result = df[df['pincode'] == pincode]
-    if not result.empty:
-        latitude = result['latitude'].iloc[0]
-        longitude = result['longitude'].iloc[0]
-        return (latitude, longitude)
-    else:
-        return (None, None)
+    return lookup.get(int(pincode), (None, None))
 
 def get_weather_data(latitude, longitude):
     """
@@ -44,6 +201,17 @@ def get_weather_data(latitude, longitude):
     Returns:
         A dictionary containing the JSON response from the API, or None if an error occurs.
     """
+    # Round coordinates to ~0.1 degree so nearby pincodes share a cache
+    # entry; cast first so non-float inputs cannot break the key
+    cache_key = f"wx:{round(float(latitude), 1)}:{round(float(longitude), 1)}"
+    if _redis_client is not None:
+        try:
+            cached = _redis_client.get(cache_key)
+            if cached:
+                return _json_loads(cached)
+        except redis.exceptions.RedisError:
+            pass
+
     base_url = "https://archive-api.open-meteo.com/v1/archive"
     params = {
         "latitude": latitude,
@@ -54,9 +222,15 @@ def get_weather_data(latitude, longitude):
     }
 
     try:
-        response = requests.get(base_url, params=params)
+        response = _session.get(base_url, params=params, timeout=10)
         response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
-        return response.json()
+        weather_data = _json_loads(response.content)
+        if _redis_client is not None:
+            try:
+                _redis_client.setex(cache_key, WEATHER_CACHE_TTL_SECONDS, _json_dumps(weather_data))
+            except redis.exceptions.RedisError:
+                pass
+        return weather_data
     except requests.exceptions.RequestException as e:
         print(f"Error fetching weather data: {e}")
         return None
@@ -84,22 +258,88 @@ def process_weather_response(response):
     if not temperature_data or not humidity_data or not precipitation_data:
         return (None, None, None)
 
-    annual_avg_temperature = np.mean(temperature_data)
-    annual_avg_humidity = np.mean(humidity_data)
-    total_annual_rainfall = np.sum(precipitation_data)
+    # One explicit float32 cast per series; reducing over the Python
+    # lists directly would go through numpy's slow object-dtype path
+    temperature = np.asarray(temperature_data, dtype=np.float32)
+    humidity = np.asarray(humidity_data, dtype=np.float32)
+    precipitation = np.asarray(precipitation_data, dtype=np.float32)
+
+    return (float(temperature.mean()), float(humidity.mean()), float(precipitation.sum()))
+
+# Weather table precomputed at build time by precompute_weather.py
+WEATHER_PARQUET_PATH = 'pincode_weather.parquet'
+
+@st.cache_resource
+def _get_precomputed_weather():
+    """
+    Loads the precomputed pincode weather table, if it has been built.
+
+    Returns:
+        A dict mapping pincode (int) to (temperature, humidity, rainfall),
+        or None if pincode_weather.parquet is absent.
+    """
+    if not os.path.exists(WEATHER_PARQUET_PATH):
+        return None
+    df = pd.read_parquet(WEATHER_PARQUET_PATH)
+    return {int(p): (t, h, r) for p, t, h, r in zip(df['pincode'], df['temperature'],
+                                                    df['humidity'], df['rainfall'])}
+
+@st.cache_data(ttl=WEATHER_CACHE_TTL_SECONDS)
+def get_annual_weather_for_pincode(pincode, _pincode_to_latlon):
+    """
+    Resolves a pincode to its annual weather metrics, cached per pincode.
+
+    Chains the lat/lon lookup, the Open-Meteo fetch, and the response
+    processing; repeat submissions for the same pincode skip the HTTP
+    round trip and numpy reduction entirely. The lookup dict argument is
+    underscore-prefixed so Streamlit keys the cache on the pincode alone.
+
+    Args:
+        pincode: The pincode to resolve.
+        _pincode_to_latlon: Dict mapping pincode (int) to (latitude, longitude).
+
+    Returns:
+        A tuple containing (annual_avg_temperature, annual_avg_humidity,
+        total_annual_rainfall).
+
+    Raises:
+        WeatherDataError: If any step fails. st.cache_data does not cache
+        exceptions, so transient fetch failures are retried on the next
+        submission instead of being memoized for the whole TTL.
+    """
+    # Answer from the build-time weather table when available: no
+    # network, no JSON parse, no reduction
+    weather_map = _get_precomputed_weather()
+    if weather_map is not None:
+        precomputed = weather_map.get(int(pincode))
+        if precomputed is not None:
+            return precomputed
+
+    latitude, longitude = get_lat_lon_from_pincode(pincode, _pincode_to_latlon)
+    if latitude is None or longitude is None:
+        raise WeatherDataError(f"Pincode {pincode} not found in the dataset.")
+
+    weather_data = get_weather_data(latitude, longitude)
+    if weather_data is None:
+        raise WeatherDataError(f"Could not retrieve weather data for pincode {pincode}.")
+
+    annual_avg_temperature, annual_avg_humidity, total_annual_rainfall = \
+        process_weather_response(weather_data)
+    if annual_avg_temperature is None or annual_avg_humidity is None or total_annual_rainfall is None:
+        raise WeatherDataError(f"Could not process weather data for pincode {pincode}.")
 
     return (annual_avg_temperature, annual_avg_humidity, total_annual_rainfall)
 
-def get_estimated_profit_and_loan(pincode, land_area, df_pincodes_selected, model, df_crop_profit):
+def get_estimated_profit_and_loan(pincode, land_area, pincode_to_latlon, model, crop_profit_map):
     """
     Retrieves weather data, predicts top crops, estimates profit and loan for a pincode and land area.
 
     Args:
         pincode: The pincode for which to retrieve data.
         land_area: The land area in hectares.
-        df_pincodes_selected: DataFrame with pincode, lat, lon.
+        pincode_to_latlon: Dict mapping pincode (int) to (latitude, longitude).
         model: Trained machine learning model.
-        df_crop_profit: DataFrame with crop profit data.
+        crop_profit_map: Dict mapping lowercased crop name to (profit, cost) per hectare.
 
     Returns:
         A dictionary containing the results (weather data, top crops, ratio, profit, loan),
@@ -107,20 +347,23 @@ def get_estimated_profit_and_loan(pincode, land_area, df_pincodes_selected, mode
     """
     results = {}
 
-    # 1. Get latitude and longitude from pincode
-    latitude, longitude = get_lat_lon_from_pincode(pincode, df_pincodes_selected)
-    if latitude is None or longitude is None:
-        return {"error": f"Pincode {pincode} not found in the dataset."}
+    # Normalize once so string and int inputs share one weather cache key
+    pincode = int(pincode)
 
-    # 2. Call the get_weather_data function
-    weather_data = get_weather_data(latitude, longitude)
-    if weather_data is None:
-        return {"error": f"Could not retrieve weather data for pincode {pincode}."}
+    # 0. Bail out before any network or model work on invalid land area
+    if land_area <= 0:
+        return {"estimation_message": "Please enter a valid land area to estimate profit and loan amount."}
 
-    # 3. Process the weather response
-    annual_avg_temperature, annual_avg_humidity, total_annual_rainfall = process_weather_response(weather_data)
-    if annual_avg_temperature is None or annual_avg_humidity is None or total_annual_rainfall is None:
-        return {"error": f"Could not process weather data for pincode {pincode}."}
+    # 1. Check the pincode before doing any network work
+    if pincode not in pincode_to_latlon:
+        return {"error": f"Pincode {pincode} not found in the dataset."}
+
+    # 2. Resolve the pincode to annual weather metrics (cached per pincode)
+    try:
+        annual_avg_temperature, annual_avg_humidity, total_annual_rainfall = \
+            get_annual_weather_for_pincode(pincode, pincode_to_latlon)
+    except WeatherDataError as e:
+        return {"error": str(e)}
 
     results["weather"] = {
         "temperature": annual_avg_temperature,
@@ -128,18 +371,21 @@ def get_estimated_profit_and_loan(pincode, land_area, df_pincodes_selected, mode
         "rainfall": total_annual_rainfall
     }
 
-    # 4. Create a DataFrame for model prediction
-    weather_input_df = pd.DataFrame({
-        'temperature': [annual_avg_temperature],
-        'humidity': [annual_avg_humidity],
-        'rainfall': [total_annual_rainfall]
-    })
-
-    # 5. Get prediction probabilities
-    predictions_proba = model.predict_proba(weather_input_df)[0]
-
-    # 6. Get the top two predicted commodities
-    top_two_indices = predictions_proba.argsort()[-2:][::-1]
+    # 4. Build the 1-row model input directly as a numpy array; sklearn
+    # converts a DataFrame back to an array anyway
+    weather_input = np.asarray([[annual_avg_temperature, annual_avg_humidity, total_annual_rainfall]],
+                               dtype=np.float32)
+
+    # 5. Get prediction probabilities; the sklearn model was fitted on a
+    # named DataFrame, so quiet its feature-name warning for array input
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message='X does not have valid feature names')
+        predictions_proba = model.predict_proba(weather_input)[0]
+
+    # 6. Get the top two predicted commodities (argpartition is O(n) vs
+    # a full O(n log n) sort over all classes)
+    top_candidates = np.argpartition(predictions_proba, -2)[-2:]
+    top_two_indices = top_candidates[np.argsort(-predictions_proba[top_candidates])]
     top_two_commodities = [(model.classes_[i], predictions_proba[i]) for i in top_two_indices]
     results["top_crops"] = top_two_commodities
 
@@ -152,11 +398,13 @@ def get_estimated_profit_and_loan(pincode, land_area, df_pincodes_selected, mode
         commodity2, prob2 = top_two_commodities[1]
 
         if prob2 > 0:
-            prob1_int = int(prob1 * 1000)
-            prob2_int = int(prob2 * 1000)
-            gcd_val = math.gcd(prob1_int, prob2_int)
-            simplified_ratio_num = prob1_int // gcd_val
-            simplified_ratio_den = prob2_int // gcd_val
+            # Bounded-denominator approximation gives stable, readable
+            # ratios (e.g. 0.5001/0.4999 -> 1:1 rather than 625:624).
+            # Cast to Python floats: Fraction rejects np.float32, which
+            # is what the ONNX path emits
+            ratio = Fraction(float(prob1) / float(prob2)).limit_denominator(10)
+            simplified_ratio_num = ratio.numerator
+            simplified_ratio_den = ratio.denominator
             ratio_display = f"{simplified_ratio_num}:{simplified_ratio_den}"
         else:
             ratio_display = f"{top_two_commodities[0][0]} (single recommendation)"
@@ -172,47 +420,72 @@ def get_estimated_profit_and_loan(pincode, land_area, df_pincodes_selected, mode
 
     results["crop_ratio"] = ratio_display
 
-    # 8. Calculate estimated profit and loan
-    estimated_total_profit = 0
-    estimated_total_cost_of_production = 0
+    # 8. Calculate estimated profit and loan with a single vectorized
+    # multiply over the (at most two) recommended crops
     total_ratio_parts = simplified_ratio_num + simplified_ratio_den
 
-    if land_area > 0:
-        for i, (commodity, _) in enumerate(top_two_commodities):
-            profit_cost_row = df_crop_profit[df_crop_profit['Crop'].str.lower() == commodity.lower()]
-            if not profit_cost_row.empty:
-                profit_per_hectare = profit_cost_row['Profit_per_Hectare (₹)'].iloc[0]
-                cost_per_hectare = profit_cost_row['Cost_of_Production_per_Hectare (₹)'].iloc[0]
+    # Crops without profit/cost data contribute zero, as before
+    profit_per_hectare = np.array([crop_profit_map.get(c.lower(), (0.0, 0.0))[0]
+                                   for c, _ in top_two_commodities])
+    cost_per_hectare = np.array([crop_profit_map.get(c.lower(), (0.0, 0.0))[1]
+                                 for c, _ in top_two_commodities])
+    for commodity, _ in top_two_commodities:
+        if commodity.lower() not in crop_profit_map:
+            print(f"Warning: Profit/Cost data not found for {commodity}.") # For debugging in Colab
 
-                if len(top_two_commodities) >= 2 and total_ratio_parts > 0:
-                    if i == 0: # First commodity
-                        allocated_land = (simplified_ratio_num / total_ratio_parts) * land_area
-                    else: # Second commodity
-                         allocated_land = (simplified_ratio_den / total_ratio_parts) * land_area
-                else: # Only one commodity or ratio is invalid
-                     allocated_land = land_area
+    if len(top_two_commodities) >= 2 and total_ratio_parts > 0:
+        shares = np.array([simplified_ratio_num, simplified_ratio_den]) / total_ratio_parts
+    else: # Only one commodity or ratio is invalid
+        shares = np.ones(len(top_two_commodities))
 
-                estimated_profit_commodity = allocated_land * profit_per_hectare
-                estimated_cost_commodity = allocated_land * cost_per_hectare
+    allocated_land = shares * land_area
+    estimated_total_profit = float((allocated_land * profit_per_hectare).sum())
+    estimated_total_cost_of_production = float((allocated_land * cost_per_hectare).sum())
 
-                estimated_total_profit += estimated_profit_commodity
-                estimated_total_cost_of_production += estimated_cost_commodity
+    results["estimated_profit"] = estimated_total_profit
+    results["estimated_cost_of_production"] = estimated_total_cost_of_production
 
-            else:
-                print(f"Warning: Profit/Cost data not found for {commodity}.") # For debugging in Colab
+    # 9. Estimate potential loan amount (e.g., 80% of estimated cost of production)
+    loan_percentage = 0.80
+    estimated_loan_amount = estimated_total_cost_of_production * loan_percentage
+    results["estimated_loan_amount"] = estimated_loan_amount
 
-        results["estimated_profit"] = estimated_total_profit
-        results["estimated_cost_of_production"] = estimated_total_cost_of_production
+    return results
 
-        # 9. Estimate potential loan amount (e.g., 80% of estimated cost of production)
-        loan_percentage = 0.80
-        estimated_loan_amount = estimated_total_cost_of_production * loan_percentage
-        results["estimated_loan_amount"] = estimated_loan_amount
+def get_estimated_profit_and_loan_batch(pincodes, land_areas, pincode_to_latlon, model, crop_profit_map, max_workers=8):
+    """
+    Runs the profit and loan estimate for several pincodes at once.
 
-    else:
-        results["estimation_message"] = "Please enter a valid land area to estimate profit and loan amount."
+    The Open-Meteo fetches are pure I/O, so they are issued in parallel
+    with a thread pool: N pincodes cost roughly one round trip instead of
+    N. Each fetch goes through get_annual_weather_for_pincode, warming
+    its cache so the per-pincode estimates below are then network-free.
 
-    return results
+    Args:
+        pincodes: A list of pincodes to analyse.
+        land_areas: A list of land areas (hectares), one per pincode.
+        pincode_to_latlon: Dict mapping pincode (int) to (latitude, longitude).
+        model: Trained machine learning model.
+        crop_profit_map: Dict mapping lowercased crop name to (profit, cost) per hectare.
+        max_workers: Number of concurrent weather fetches.
+
+    Returns:
+        A list of result dictionaries, one per (pincode, land_area) pair.
+    """
+    unique_pincodes = {int(p) for p in pincodes if int(p) in pincode_to_latlon}
+    if unique_pincodes:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(get_annual_weather_for_pincode, p, pincode_to_latlon)
+                       for p in unique_pincodes]
+            for future in futures:
+                try:
+                    future.result()
+                except WeatherDataError:
+                    # The per-pincode estimate below reports the error
+                    pass
+
+    return [get_estimated_profit_and_loan(pincode, land_area, pincode_to_latlon, model, crop_profit_map)
+            for pincode, land_area in zip(pincodes, land_areas)]
 
 # Example usage (for testing the function in Colab)
 # Assuming df_pincodes_selected, model, and df_crop_profit are loaded
@@ -0,0 +1,27 @@
+"""
+One-off script: re-serialize the trained RandomForest with joblib.
+
+joblib.dump with compress=3 deduplicates the numpy arrays shared across
+tree nodes, producing a smaller artifact that also loads faster than the
+plain pickle. Run once after (re)training:
+
+    python compress_model.py
+"""
+
+import pickle
+
+import joblib
+
+PICKLE_PATH = 'random_forest_model.pkl'
+JOBLIB_PATH = 'rf.joblib'
+
+
+def main():
+    with open(PICKLE_PATH, 'rb') as f:
+        model = pickle.load(f)
+    joblib.dump(model, JOBLIB_PATH, compress=3)
+    print(f"Wrote {JOBLIB_PATH}")
+
+
+if __name__ == '__main__':
+    main()
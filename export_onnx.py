@@ -0,0 +1,43 @@
+"""
+One-off script: compile the trained RandomForest to ONNX.
+
+ONNX Runtime evaluates the whole forest as a single compiled graph,
+which is far faster than scikit-learn's per-tree Python/Cython dispatch
+for single-row predict_proba calls. Run once after (re)training:
+
+    python export_onnx.py
+
+Writes rf.onnx plus rf_classes.npy (the class labels, which ONNX does
+not carry in a convenient form for the serving wrapper).
+"""
+
+import pickle
+
+import numpy as np
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
+
+PICKLE_PATH = 'random_forest_model.pkl'
+ONNX_PATH = 'rf.onnx'
+CLASSES_PATH = 'rf_classes.npy'
+
+
+def main():
+    with open(PICKLE_PATH, 'rb') as f:
+        model = pickle.load(f)
+
+    # zipmap=False makes the probability output a plain float matrix
+    # instead of a list of per-row dicts
+    onx = convert_sklearn(
+        model,
+        initial_types=[('input', FloatTensorType([None, 3]))],
+        options={id(model): {'zipmap': False}},
+    )
+    with open(ONNX_PATH, 'wb') as f:
+        f.write(onx.SerializeToString())
+    np.save(CLASSES_PATH, model.classes_)
+    print(f"Wrote {ONNX_PATH} and {CLASSES_PATH}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+One-off script: precompute annual weather for every known pincode.
+
+The Open-Meteo archive API serves static 2023 history, so the
+(temperature, humidity, rainfall) triple for each pincode can be
+computed once at build time and shipped as pincode_weather.parquet.
+The serve path then answers from a dict lookup with no network call.
+Run once (or whenever the pincode dataset changes):
+
+    python precompute_weather.py
+
+Pincodes are deduplicated onto the same 0.1 degree grid the runtime
+cache uses, so the number of API calls stays well below the number of
+pincodes and respects Open-Meteo's rate limits.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from app_logic import get_weather_data, process_weather_response
+
+PINCODES_CSV = 'df_pincodes_selected.csv'
+PARQUET_PATH = 'pincode_weather.parquet'
+MAX_WORKERS = 8
+
+
+def main():
+    df = pd.read_csv(PINCODES_CSV)
+    # The raw coordinate columns are object dtype (degree notation and
+    # 'nan' strings); coerce and skip pincodes without a valid pair
+    df['latitude'] = pd.to_numeric(df['latitude'], errors='coerce')
+    df['longitude'] = pd.to_numeric(df['longitude'], errors='coerce')
+    df = df.dropna(subset=['latitude', 'longitude']).drop_duplicates(subset='pincode')
+
+    # One fetch per coarse grid cell; every pincode in the cell reuses it
+    cell_for_pincode = {}
+    cells = set()
+    for pincode, lat, lon in zip(df['pincode'].astype(int), df['latitude'], df['longitude']):
+        cell = (round(lat, 1), round(lon, 1))
+        cell_for_pincode[pincode] = cell
+        cells.add(cell)
+
+    def fetch(cell):
+        lat, lon = cell
+        return cell, process_weather_response(get_weather_data(lat, lon))
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        cell_weather = dict(executor.map(fetch, sorted(cells)))
+
+    rows = []
+    for pincode, cell in cell_for_pincode.items():
+        temperature, humidity, rainfall = cell_weather[cell]
+        if temperature is None:
+            print(f"Warning: no weather data for pincode {pincode} (cell {cell}), skipping.")
+            continue
+        rows.append((pincode, temperature, humidity, rainfall))
+
+    pd.DataFrame(rows, columns=['pincode', 'temperature', 'humidity', 'rainfall']) \
+        .to_parquet(PARQUET_PATH, index=False)
+    print(f"Wrote {PARQUET_PATH} ({len(rows)} pincodes from {len(cells)} grid cells)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,63 @@
 
+import os
 import streamlit as st
 import pandas as pd
 import pickle
-from app_logic import get_estimated_profit_and_loan
+import joblib
+import app_logic
+from app_logic import get_estimated_profit_and_loan, build_pincode_latlon_lookup, build_crop_profit_map, publish_lookups_to_redis, OnnxCropModel
 
-# Load data and model
-@st.cache_data
-def load_data():
+# Compiled/compressed artifacts produced by export_onnx.py and
+# compress_model.py; the loader falls back to the original pickle if
+# they have not been generated yet
+MODEL_ONNX_PATH = 'rf.onnx'
+MODEL_CLASSES_PATH = 'rf_classes.npy'
+MODEL_JOBLIB_PATH = 'rf.joblib'
+MODEL_PICKLE_PATH = 'random_forest_model.pkl'
+
+# Model and tables are read-only singletons, so they are cached with
+# st.cache_resource and shared across sessions without per-request copies
+@st.cache_resource
+def load_model():
+	if app_logic.onnxruntime is not None and os.path.exists(MODEL_ONNX_PATH) and os.path.exists(MODEL_CLASSES_PATH):
+		return OnnxCropModel(MODEL_ONNX_PATH, MODEL_CLASSES_PATH)
+	if os.path.exists(MODEL_JOBLIB_PATH):
+		return joblib.load(MODEL_JOBLIB_PATH)
+	with open(MODEL_PICKLE_PATH, 'rb') as f:
+		return pickle.load(f)
+
+# Each table gets its own loader so each file is read exactly once per
+# worker lifetime and changing one table never reloads the others
+@st.cache_resource
+def load_pincode_map():
 	df_pincodes_selected = pd.read_csv('df_pincodes_selected.csv')
-	df_crop_profit = pd.read_csv('df_crop_profit.csv')
-	with open('random_forest_model.pkl', 'rb') as f:
-		model = pickle.load(f)
-	return df_pincodes_selected, df_crop_profit, model
+	return build_pincode_latlon_lookup(df_pincodes_selected)
+
+@st.cache_resource
+def load_crop_map():
+	return build_crop_profit_map('df_crop_profit.csv')
+
+@st.cache_resource
+def load_lookups():
+	pincode_to_latlon = load_pincode_map()
+	crop_profit_map = load_crop_map()
+	# On multi-worker deployments, share one copy of the lookup tables
+	# through Redis hashes instead of duplicating them per process
+	if os.environ.get('HARVESTCOMPASS_REDIS_LOOKUPS'):
+		redis_maps = publish_lookups_to_redis(pincode_to_latlon, crop_profit_map)
+		if redis_maps is not None:
+			return redis_maps
+	return pincode_to_latlon, crop_profit_map
+
+# Sorted pincode strings for the dropdown, computed once instead of on
+# every rerun (the script body re-executes on each widget interaction)
+@st.cache_resource
+def load_unique_pincodes():
+	return sorted(str(p) for p in load_pincode_map())
 
-df_pincodes_selected, df_crop_profit, model = load_data()
+model = load_model()
+pincode_to_latlon, crop_profit_map = load_lookups()
+unique_pincodes = load_unique_pincodes()
 
 
 # --- UI ---
@@ -65,7 +109,6 @@ col1, col2 = st.columns([1,2])
 with col1:
 	st.header("📍 Enter Your Details")
 	# Dropdown for pincode selection
-	unique_pincodes = df_pincodes_selected['pincode'].drop_duplicates().astype(str).sort_values().tolist()
 	pincode = st.selectbox("Pincode", unique_pincodes, help="Select a 6-digit pincode")
 	land_area = st.number_input("Land Area (in hectares)", min_value=0.0, step=0.1, help="Total land area you want to cultivate")
 	submitted = st.button("Estimate Profit & Loan 🚜")
@@ -74,11 +117,14 @@ with col2:
 	if submitted:
 		if not pincode.isdigit() or len(pincode) != 6:
 			st.error("❌ Please select a valid 6-digit pincode.")
+		elif int(pincode) not in pincode_to_latlon:
+			# Fail on unknown pincodes here, before any weather fetch
+			st.error(f"❌ Pincode {pincode} not found in the dataset.")
 		elif land_area <= 0:
 			st.error("❌ Please enter a valid land area greater than 0.")
 		else:
 			with st.spinner("Crunching numbers and fetching weather data... 🌦️"):
-				result = get_estimated_profit_and_loan(int(pincode), land_area, df_pincodes_selected, model, df_crop_profit)
+				result = get_estimated_profit_and_loan(int(pincode), land_area, pincode_to_latlon, model, crop_profit_map)
 			if "error" in result:
 				st.error(f"❌ {result['error']}")
 			else: